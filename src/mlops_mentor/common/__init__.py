@@ -1,9 +1,251 @@
+import atexit
+import itertools
 import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 
+import orjson
+import requests
 from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 GH_TOKEN = os.getenv("GH_TOKEN") or os.getenv("GITHUB_TOKEN")
-if not GH_TOKEN:
+# Several comma-separated tokens multiply the available rate limit
+GH_TOKENS = [token for token in os.getenv("GH_TOKENS", "").split(",") if token] or (
+    [GH_TOKEN] if GH_TOKEN else []
+)
+if not GH_TOKENS:
     logger.error("GitHub token not found in environment variables.")
     raise EnvironmentError("GitHub token not found in environment variables.")
-github_headers = {"Authorization": f"Bearer {GH_TOKEN}"}
+github_graphql_url = "https://api.github.com/graphql"
+
+# Cached responses younger than this are replayed without contacting GitHub
+GH_CACHE_TTL_SECONDS = int(os.getenv("GH_CACHE_TTL_SECONDS", "3600"))
+# (connect, read) timeouts in seconds of requests that do not set their own, so
+# that a stalled connection fails fast and is retried
+REQUEST_TIMEOUT = (3.05, 10)
+# GraphQL queries batching many pull requests take longer to resolve
+GRAPHQL_TIMEOUT = (3.05, 60)
+
+# Persistent ETag cache shared by all sessions and threads, and thereby by all tokens
+GH_CACHE_PATH = Path(".cache/github.sqlite")
+_etag_cache_lock = threading.Lock()
+
+
+@cache
+def _etag_cache() -> sqlite3.Connection:
+    """Opens the ETag cache on first use.
+
+    The connection is shared by all threads, every access holds `_etag_cache_lock`.
+    """
+    GH_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(GH_CACHE_PATH, check_same_thread=False)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, entry BLOB)"
+    )
+    atexit.register(connection.close)
+    return connection
+
+
+def _get_cached(url: str) -> dict | None:
+    """Returns the cache entry of a URL, if any."""
+    with _etag_cache_lock:
+        row = (
+            _etag_cache()
+            .execute("SELECT entry FROM responses WHERE url = ?", (url,))
+            .fetchone()
+        )
+    return pickle.loads(row[0]) if row else None
+
+
+def _set_cached(url: str, entry: dict) -> None:
+    """Stores the cache entry of a URL."""
+    with _etag_cache_lock, _etag_cache() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?)", (url, pickle.dumps(entry))
+        )
+
+
+class GitHubSession(requests.Session):
+    """Session for a single GitHub token.
+
+    GET requests are revalidated against a persistent ETag cache: GitHub answers a
+    request carrying a known `If-None-Match` with `304 Not Modified`, which does not
+    count against the rate limit, in which case the cached body is replayed. Cached
+    responses younger than `GH_CACHE_TTL_SECONDS` are replayed without a request,
+    except pages of a paginated listing. The cache is keyed by URL only and shared
+    by the sessions of all tokens, so a response fetched with one token may be
+    replayed for another. The tokens in `GH_TOKENS` are therefore assumed to have
+    access to the same repositories. Rate limited requests are retried with
+    exponential backoff, honoring the `Retry-After` header. The session also records
+    when its token is rate limited so that it can be skipped.
+    """
+
+    def __init__(self, token: str) -> None:
+        super().__init__()
+        self.headers.update({"Authorization": f"Bearer {token}"})
+        self.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=32,
+                pool_maxsize=32,
+                max_retries=Retry(
+                    total=5,
+                    backoff_factor=0.5,
+                    # A 403 is left out since GitHub also returns it for missing
+                    # permissions; rate limits are signalled with a 429 and a
+                    # Retry-After header, or rotated away from by get_session
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET", "HEAD"],
+                    respect_retry_after_header=True,
+                    # Hand back the final response instead of raising once the
+                    # retries are used up
+                    raise_on_status=False,
+                ),
+            ),
+        )
+        self.rate_limit_reset = 0.0  # Epoch time until which the token is exhausted
+
+    def request(self, method: str, url: str, *args, **kwargs) -> requests.Response:
+        """Sends a request, using the ETag cache for GET requests."""
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        if method.upper() != "GET":
+            return self._track_rate_limit(super().request(method, url, *args, **kwargs))
+
+        key = requests.Request(method, url, params=kwargs.get("params")).prepare().url
+        cached = _get_cached(key)
+        # Items shift between pages as new ones arrive, so pages of a listing are
+        # always revalidated to keep them consistent with each other
+        paginated = "page" in parse_qs(urlparse(key).query)
+        if (
+            cached is not None
+            and not paginated
+            and time.time() - cached.get("time", 0) < GH_CACHE_TTL_SECONDS
+        ):
+            return self._replay(key, cached)
+        if cached is not None:
+            kwargs["headers"] = {
+                **kwargs.get("headers", {}),
+                "If-None-Match": cached["etag"],
+            }
+
+        response = self._track_rate_limit(super().request(method, url, *args, **kwargs))
+        if response.status_code == 304 and cached is not None:
+            response.status_code = 200
+            response._content = cached["content"]
+            for header, value in cached["headers"].items():
+                response.headers.setdefault(header, value)
+            _set_cached(key, {**cached, "time": time.time()})
+        elif response.status_code == 200 and "ETag" in response.headers:
+            _set_cached(
+                key,
+                {
+                    "etag": response.headers["ETag"],
+                    "content": response.content,
+                    "headers": dict(response.headers),
+                    "time": time.time(),
+                },
+            )
+        return response
+
+    @staticmethod
+    def _replay(url: str, cached: dict) -> requests.Response:
+        """Builds a response from a cache entry."""
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response._content = cached["content"]
+        response.headers.update(cached["headers"])
+        return response
+
+    def _track_rate_limit(self, response: requests.Response) -> requests.Response:
+        """Records the reset time if the response exhausted the token."""
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            self.rate_limit_reset = float(response.headers.get("X-RateLimit-Reset", 0))
+        return response
+
+
+# One session per token, each reusing pooled keep-alive connections
+_sessions = [GitHubSession(token) for token in GH_TOKENS]
+_session_cycle = itertools.cycle(_sessions)
+_session_lock = threading.Lock()
+
+
+def get_session() -> GitHubSession:
+    """Returns the next GitHub session in round-robin order.
+
+    Sessions whose token is rate limited are skipped until their limit resets. If
+    every token is exhausted the one that resets first is returned.
+    """
+    with _session_lock:
+        for _ in range(len(_sessions)):
+            session = next(_session_cycle)
+            if session.rate_limit_reset <= time.time():
+                return session
+    logger.warning("All GitHub tokens are rate limited.")
+    return min(_sessions, key=lambda session: session.rate_limit_reset)
+
+
+def get_json(url: str, params: dict | None = None):
+    """Fetches a GitHub REST endpoint and returns its decoded JSON body."""
+    response = get_session().get(url, params=params)
+    return orjson.loads(response.content)
+
+
+def graphql(query: str, variables: dict | None = None) -> dict:
+    """Runs a query against the GitHub GraphQL API and returns its data."""
+    response = get_session().post(
+        github_graphql_url,
+        data=orjson.dumps({"query": query, "variables": variables or {}}),
+        headers={"Content-Type": "application/json"},
+        timeout=GRAPHQL_TIMEOUT,
+    )
+    if not response.ok:
+        logger.error(f"GraphQL request failed: {response.status_code}")
+        response.raise_for_status()
+    data = orjson.loads(response.content)
+    if "errors" in data:
+        logger.error(f"GraphQL query failed: {data['errors']}")
+        raise RuntimeError(f"GraphQL query failed: {data['errors']}")
+    return data["data"]
+
+
+def get_all_pages(
+    url: str, params: dict | None = None, total: int | None = None, max_workers: int = 8
+) -> list:
+    """Returns all items of a paginated GitHub endpoint.
+
+    If the total number of items is known up front all pages are fetched
+    concurrently. Otherwise the first page is fetched to discover the last page
+    number from the `Link` header, after which the remaining pages are fetched
+    concurrently.
+    """
+    per_page = 100
+    params = {**(params or {}), "per_page": per_page}
+
+    def get_page(page: int) -> list:
+        return get_json(url, params={**params, "page": page})
+
+    if total is not None:
+        items, first_page, last_page = [], 1, -(-total // per_page)
+    else:
+        response = get_session().get(url, params={**params, "page": 1})
+        items = orjson.loads(response.content)
+        if "last" not in response.links:
+            return items
+        first_page = 2
+        last_page = int(
+            parse_qs(urlparse(response.links["last"]["url"]).query)["page"][0]
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page in executor.map(get_page, range(first_page, last_page + 1)):
+            items.extend(page)
+    return items
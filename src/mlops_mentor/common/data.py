@@ -1,25 +1,37 @@
-import csv
-from pathlib import Path
+import pandas as pd
 
 from mlops_mentor.common.models import GroupInfo, RepoInfo
 
+GROUP_COLUMNS = [
+    "group_number",
+    "student_1",
+    "student_2",
+    "student_3",
+    "student_4",
+    "student_5",
+    "repo_url",
+]
+
 
 def load_groups(file_name: str = "group_info.csv") -> list[GroupInfo]:
-    """Loads the group-repository data into a DataFrame."""
-    with Path(file_name).open() as f:
-        csv_reader = csv.reader(f, delimiter=",")
-        content = []
-        for i, row in enumerate(csv_reader):
-            if i == 0:  # Skip the header
-                continue
-            group = GroupInfo(
-                group_number=int(row[0]),
-                student_1=row[1] if row[1] != "" else None,
-                student_2=row[2] if row[2] != "" else None,
-                student_3=row[3] if row[3] != "" else None,
-                student_4=row[4] if row[4] != "" else None,
-                student_5=row[5] if row[5] != "" else None,
-                repo_info=RepoInfo(repo_url=row[6]),
-            )
-            content.append(group)
-    return content
+    """Loads the group-repository data into a list of groups."""
+    df = pd.read_csv(
+        file_name,
+        header=0,  # Columns are matched by position, not by header name
+        names=GROUP_COLUMNS,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        skipinitialspace=True,
+    )
+    # The only coercion needed; the rest is trusted and skips model validation
+    df["group_number"] = df["group_number"].astype(int)
+    df = df.astype(object).where(df.notna(), None)
+
+    repo_urls = df.pop("repo_url")
+    return [
+        GroupInfo.model_construct(
+            **record, repo_info=RepoInfo.model_construct(repo_url=repo_url)
+        )
+        for record, repo_url in zip(df.to_dict(orient="records"), repo_urls)
+    ]
@@ -1,8 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
 import requests
 from loguru import logger
 from pydantic import BaseModel
 
-from mlops_mentor.common import github_headers as headers
+from mlops_mentor.common import get_all_pages, get_session, graphql
+
+REPO_OVERVIEW_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      name
+      target { ... on Commit { history { totalCount } } }
+    }
+    pullRequests(states: [OPEN, CLOSED, MERGED]) { totalCount }
+  }
+}
+"""
+
+MERGED_PRS_QUERY = """
+query($owner: String!, $name: String!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: [MERGED], first: 100, after: $after) {
+      nodes { number }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+PR_COMMITS_FRAGMENT = """
+fragment PullRequestCommits on PullRequest {
+  commits(first: 250) {
+    nodes {
+      commit {
+        oid
+        message
+        authoredDate
+        committedDate
+        author { name user { login } }
+        committer { name user { login } }
+      }
+    }
+  }
+}
+"""
+PR_COMMITS_BATCH_SIZE = 50  # Pull requests per GraphQL query
+
+
+def _to_rest_commit(commit: dict) -> dict:
+    """Converts a GraphQL commit into the shape of the REST API."""
+
+    def account(actor: dict | None) -> dict | None:
+        return {"login": actor["user"]["login"]} if actor and actor["user"] else None
+
+    return {
+        "sha": commit["oid"],
+        "author": account(commit["author"]),
+        "committer": account(commit["committer"]),
+        "commit": {
+            "message": commit["message"],
+            "author": {
+                "name": (commit["author"] or {}).get("name"),
+                "date": commit["authoredDate"],
+            },
+            "committer": {
+                "name": (commit["committer"] or {}).get("name"),
+                "date": commit["committedDate"],
+            },
+        },
+    }
 
 
 class Contributor(BaseModel):
@@ -23,16 +90,11 @@ class RepoInfo(BaseModel):
 
     repo_url: str
 
-    @property
+    @cached_property
     def is_accessible(self) -> bool:
         """Returns True if the repository is accessible."""
-        if hasattr(self, "_repo_accessible") and self._repo_accessible is not None:
-            return self._repo_accessible
-
         try:
-            response = requests.head(
-                self.repo_url, headers=headers, timeout=100, allow_redirects=False
-            )
+            response = get_session().head(self.repo_url, allow_redirects=False)
 
             if 300 <= response.status_code < 400:  # Check if redirection occurred
                 redirect_url = response.headers.get("Location")
@@ -40,39 +102,46 @@ class RepoInfo(BaseModel):
                     self.repo_url = (
                         redirect_url  # Update the repository URL to the redirected one
                     )
+                    self.__dict__.pop("repo_api", None)  # Derived from the old URL
 
-            self._repo_accessible = (
-                requests.head(self.repo_url, headers=headers, timeout=100).status_code
-                == 200
-            )
+            return get_session().head(self.repo_url).status_code == 200
         except requests.RequestException as e:
             logger.error(f"An error occurred: {e}")
-            self._repo_accessible = False
+            return False
 
-        return self._repo_accessible
-
-    @property
+    @cached_property
     def repo_api(self) -> str:
         """Returns the API URL of the repository."""
         split = self.repo_url.split("/")
         return f"https://api.github.com/repos/{split[-2]}/{split[-1]}"
 
+    @cached_property
+    def overview(self) -> dict:
+        """Returns the default branch and commit/PR counts in a single query."""
+        owner, name = self.repo_api.split("/")[-2:]
+        return graphql(REPO_OVERVIEW_QUERY, {"owner": owner, "name": name})[
+            "repository"
+        ]
+
     @property
     def default_branch(self) -> str:
         """Returns the default branch of the repository."""
-        if hasattr(self, "_default_branch"):
-            return self._default_branch
-        self._default_branch = requests.get(
-            self.repo_api, headers=headers, timeout=100
-        ).json()["default_branch"]
-        return self._default_branch
+        return self.overview["defaultBranchRef"]["name"]
 
     @property
+    def num_commits(self) -> int:
+        """Returns the number of commits to the default branch."""
+        return self.overview["defaultBranchRef"]["target"]["history"]["totalCount"]
+
+    @property
+    def num_prs(self) -> int:
+        """Returns the number of pull requests to the repository."""
+        return self.overview["pullRequests"]["totalCount"]
+
+    @cached_property
     def contributors(self) -> list[Contributor]:
         """Returns all contributors to the repository."""
-        request = requests.get(
-            f"{self.repo_api}/contributors", headers=headers, timeout=100
-        ).json()
+        request = get_all_pages(f"{self.repo_api}/contributors")
         return [
             Contributor(
                 login=c["login"], contributions=c["contributions"], commits_pr=0
@@ -80,41 +149,86 @@ class RepoInfo(BaseModel):
             for c in request
         ]
 
-    @property
+    @cached_property
     def prs(self) -> list:
         """Returns all pull requests to the repository."""
-        prs = []
-        page_counter = 1
+        return get_all_pages(
+            f"{self.repo_api}/pulls", params={"state": "all"}, total=self.num_prs
+        )
+
+    @cached_property
+    def merged_prs(self) -> list[int]:
+        """Returns the numbers of the merged pull requests to the repository.
+
+        Only the numbers are requested, which is far less data than listing the
+        pull requests through the REST API.
+        """
+        owner, name = self.repo_api.split("/")[-2:]
+        numbers, after = [], None
         while True:
-            request = requests.get(
-                f"{self.repo_api}/pulls",
-                headers=headers,
-                timeout=100,
-                params={"state": "all", "page": page_counter, "per_page": 100},
-            ).json()
-            if len(request) == 0:
-                break
-            page_counter += 1
-            prs.extend(request)
-        return prs
-
-    @property
+            page = graphql(
+                MERGED_PRS_QUERY, {"owner": owner, "name": name, "after": after}
+            )["repository"]["pullRequests"]
+            numbers.extend(node["number"] for node in page["nodes"])
+            if not page["pageInfo"]["hasNextPage"]:
+                return numbers
+            after = page["pageInfo"]["endCursor"]
+
+    @cached_property
     def commits(self) -> list:
         """Returns all commits to the default branch."""
-        commits = []
-        page_counter = 1
-        while True:
-            request = requests.get(
-                f"{self.repo_api}/commits",
-                headers=headers,
-                timeout=100,
-                params={"page": page_counter, "per_page": 100},
-            ).json()
-            if len(request) == 0:
-                break
-            page_counter += 1
-            commits.extend(request)
-        return commits
+        return get_all_pages(f"{self.repo_api}/commits", total=self.num_commits)
+
+    def pr_commits(self, numbers: list[int], max_workers: int = 8) -> list[list[dict]]:
+        """Returns the commits of each of the given pull requests.
+
+        The commits of up to `PR_COMMITS_BATCH_SIZE` pull requests are fetched in a
+        single GraphQL query, aliasing each pull request, and the queries are run
+        concurrently. Like the REST API at most 250 commits are returned per pull
+        request.
+        """
+        owner, name = self.repo_api.split("/")[-2:]
+
+        def get_batch(batch: list[int]) -> list[list[dict]]:
+            aliases = "\n".join(
+                f"pr{number}: pullRequest(number: {number}) {{ ...PullRequestCommits }}"
+                for number in batch
+            )
+            query = f"""
+            query($owner: String!, $name: String!) {{
+              repository(owner: $owner, name: $name) {{ {aliases} }}
+            }}
+            {PR_COMMITS_FRAGMENT}
+            """
+            repository = graphql(query, {"owner": owner, "name": name})["repository"]
+            return [
+                [
+                    _to_rest_commit(node["commit"])
+                    for node in repository[f"pr{number}"]["commits"]["nodes"]
+                ]
+                for number in batch
+            ]
+
+        batches = [
+            numbers[i : i + PR_COMMITS_BATCH_SIZE]
+            for i in range(0, len(numbers), PR_COMMITS_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [
+                commits
+                for batch in executor.map(get_batch, batches)
+                for commits in batch
+            ]
+
+    def fetch_all(self) -> None:
+        """Fetches all API-derived properties of the repository concurrently."""
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            contributors = executor.submit(getattr, self, "contributors")
+            _ = self.overview  # commits need the count first
+            merged_prs = executor.submit(getattr, self, "merged_prs")
+            commits = executor.submit(getattr, self, "commits")
+            for future in (contributors, merged_prs, commits):
+                future.result()
 
 
 class GroupInfo(BaseModel):
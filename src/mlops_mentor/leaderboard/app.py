@@ -1,41 +1,63 @@
 import base64
+import threading
+import time
+from functools import lru_cache, partial
 from io import BytesIO
 
 import gradio as gr
-import matplotlib.pyplot as plt
 import pandas as pd
 from datasets import load_dataset
 
+# Gradio serves requests from worker threads, which share the sparkline figure
+_sparkline_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _get_sparkline_axes():
+    """Create the figure with minimal size that is reused for every sparkline."""
+    # Imported lazily so that matplotlib is only loaded for PNG sparklines
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(1.5, 0.4))
+    FigureCanvasAgg(figure)
+    return figure.add_subplot()
+
 
 def create_matplotlib_sparkline(contributions):
     """Create a tiny inline sparkline chart using matplotlib."""
     if not contributions or not isinstance(contributions, list):
         return ""
+    return _render_matplotlib_sparkline(tuple(contributions))
 
-    # Create figure with minimal size
-    fig, ax = plt.subplots(figsize=(1.5, 0.4))
-
-    # Plot bars
-    ax.bar(range(len(contributions)), contributions, color="#37536d", width=0.8)
-
-    # Remove all axes and borders
-    ax.axis("off")
-    ax.margins(0)
-
-    # Tight layout to minimize whitespace
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
 
-    # Convert to base64 encoded image
+@lru_cache(maxsize=1024)
+def _render_matplotlib_sparkline(contributions: tuple[int, ...]) -> str:
+    """Render a sparkline, memoized since many groups share a distribution."""
     buffer = BytesIO()
-    plt.savefig(
-        buffer,
-        format="png",
-        bbox_inches="tight",
-        pad_inches=0,
-        dpi=50,
-        transparent=True,
-    )
-    plt.close(fig)
+    with _sparkline_lock:
+        ax = _get_sparkline_axes()
+        ax.clear()
+
+        # Plot bars
+        ax.bar(range(len(contributions)), contributions, color="#37536d", width=0.8)
+
+        # Remove all axes and borders
+        ax.axis("off")
+        ax.margins(0)
+
+        # Tight layout to minimize whitespace
+        ax.figure.subplots_adjust(left=0, right=1, top=1, bottom=0)
+
+        # Convert to base64 encoded image
+        ax.figure.savefig(
+            buffer,
+            format="png",
+            bbox_inches="tight",
+            pad_inches=0,
+            dpi=50,
+            transparent=True,
+        )
     buffer.seek(0)
     img_base64 = base64.b64encode(buffer.read()).decode()
 
@@ -63,28 +85,35 @@ def create_text_sparkline(contributions):
     return sparkline
 
 
-def format_boolean(value):
-    """Convert boolean to emoji."""
-    if pd.isna(value):
-        return "❓"
-    return "✅" if value else "❌"
+# Emoji for boolean columns, missing values are shown as "❓"
+BOOLEAN_EMOJI = {True: "✅", False: "❌"}
 
+# How long a downloaded dataset is reused before refreshing from Hugging Face
+DATASET_TTL_SECONDS = 300
 
-def load_leaderboard_data():
-    """Load the repo stats dataset from Hugging Face."""
+
+@lru_cache(maxsize=1)
+def _load_repo_stats(ttl_bucket: int) -> pd.DataFrame:
+    """Load the repo stats dataset from Hugging Face, cached per TTL bucket."""
     dataset = load_dataset("rasgaard/mlops-mentor-stats", "repo_stats")
-    df = pd.DataFrame(dataset["train"])
+    return pd.DataFrame(dataset["train"])
+
 
-    # Sort by relevant metrics
+def load_leaderboard_data(use_png: bool = False, force_refresh: bool = False):
+    """Load the repo stats dataset and format it for display."""
+    if force_refresh:
+        _load_repo_stats.cache_clear()
+    df = _load_repo_stats(int(time.time() // DATASET_TTL_SECONDS))
+
+    # Sort by relevant metrics (returns a copy, leaving the cached frame intact)
     df = df.sort_values("total_commits", ascending=False)
 
     # Round numeric columns
-    df["repo_size"] = df["repo_size"].round(2)
-    df["average_commit_length_to_main"] = df["average_commit_length_to_main"].round(1)
+    df = df.round({"repo_size": 2, "average_commit_length_to_main": 1})
 
     # Add sparkline column
     df["contrib_distribution"] = df["contributions_per_contributor"].apply(
-        create_matplotlib_sparkline
+        create_matplotlib_sparkline if use_png else create_text_sparkline
     )
 
     # Convert boolean columns to emoji
@@ -94,8 +123,9 @@ def load_leaderboard_data():
         "using_dvc",
         "actions_passing",
     ]
-    for col in boolean_columns:
-        df[col] = df[col].apply(format_boolean)
+    df[boolean_columns] = df[boolean_columns].apply(
+        lambda column: column.map(BOOLEAN_EMOJI).fillna("❓")
+    )
 
     # Select and reorder columns for better display
     display_columns = [
@@ -123,17 +153,21 @@ def load_leaderboard_data():
     return df[display_columns]
 
 
-def create_leaderboard():
+def create_leaderboard(use_png: bool = False):
     """Create the Gradio leaderboard interface."""
+    load_data = partial(load_leaderboard_data, use_png=use_png)
+    force_load_data = partial(load_data, force_refresh=True)
+
     with gr.Blocks(title="MLOps Mentor Leaderboard") as demo:
         gr.Markdown("# 🏆 MLOps Mentor Leaderboard")
         gr.Markdown("Repository statistics for MLOps course groups")
 
         with gr.Row():
             refresh_btn = gr.Button("🔄 Refresh Data", variant="primary")
+            force_refresh_btn = gr.Button("⏬ Force Refresh", variant="secondary")
 
         leaderboard_table = gr.Dataframe(
-            value=load_leaderboard_data(),
+            value=load_data(),
             interactive=False,
             wrap=True,
             label="Repository Statistics",
@@ -141,7 +175,7 @@ def create_leaderboard():
                 "number",
                 "number",
                 "number",
-                "html",
+                "html" if use_png else "str",  # contrib_distribution
                 "number",
                 "number",
                 "number",
@@ -160,7 +194,8 @@ def create_leaderboard():
             ],
         )
 
-        refresh_btn.click(fn=load_leaderboard_data, outputs=leaderboard_table)
+        refresh_btn.click(fn=load_data, outputs=leaderboard_table)
+        force_refresh_btn.click(fn=force_load_data, outputs=leaderboard_table)
 
         gr.Markdown(
             """
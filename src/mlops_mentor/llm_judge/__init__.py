@@ -1 +1,8 @@
-from mlops_mentor.llm_judge.judge import codebase, report
+from mlops_mentor.llm_judge.judge import (
+    codebase,
+    codebase_async,
+    codebase_batch,
+    report,
+    report_async,
+    report_batch,
+)
@@ -1,16 +1,38 @@
-import json
+import asyncio
+import hashlib
 import os
-import shutil
+import threading
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from dataclasses import dataclass
+from functools import cache, lru_cache
 from pathlib import Path
-from pprint import pprint
+from typing import Any
 
 from loguru import logger
-from pydantic_ai import Agent, RunContext
+from openai import APIConnectionError
+from pydantic import BaseModel, SerializeAsAny, TypeAdapter
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import (
+    ModelAPIError,
+    ModelHTTPError,
+    UnexpectedModelBehavior,
+)
 from pydantic_ai.models.openai import OpenAIChatModel
 from pydantic_ai.providers.litellm import LiteLLMProvider
 from pydantic_ai.providers.ollama import OllamaProvider
+from pydantic_ai.usage import RunUsage
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 from mlops_mentor.llm_judge.models import (
+    BatchCICDResponse,
+    BatchCodeQualityResponse,
+    BatchUnitTestingResponse,
     CICDResponse,
     CodeQualityResponse,
     RepoMix,
@@ -19,47 +41,58 @@ from mlops_mentor.llm_judge.models import (
     TAReportResponse,
     UnitTestingResponse,
 )
-from mlops_mentor.llm_judge.utils import get_repo_content
+from mlops_mentor.llm_judge.utils import (
+    LLM_JUDGE_CACHE,
+    RateLimiter,
+    get_repo_content,
+    prune_cache,
+)
 
-if os.getenv("CAMPUSAI_API_KEY") is None:
-    logger.info(
-        "CAMPUSAI_API_KEY not found in environment variables. Will use OllamaProvider."
-    )
-    provider = OllamaProvider(base_url="http://localhost:11434/v1")
-    model_name = "ministral-3:8b-32k"
-else:
-    provider = LiteLLMProvider(
-        api_base="https://chat.campusai.compute.dtu.dk/api/v1",
-        api_key=os.getenv("CAMPUSAI_API_KEY"),
-    )
-    model_name = "Gemma3"
 
-model = OpenAIChatModel(
-    model_name=model_name,
-    provider=provider,
-)
+@lru_cache(maxsize=1)
+def get_model() -> OpenAIChatModel:
+    """Returns the judge model, created on first use and shared afterwards."""
+    if os.getenv("CAMPUSAI_API_KEY") is None:
+        logger.info(
+            "CAMPUSAI_API_KEY not found in environment variables. Will use OllamaProvider."
+        )
+        provider = OllamaProvider(base_url="http://localhost:11434/v1")
+        model_name = "ministral-3:8b-32k"
+    else:
+        provider = LiteLLMProvider(
+            api_base="https://chat.campusai.compute.dtu.dk/api/v1",
+            api_key=os.getenv("CAMPUSAI_API_KEY"),
+        )
+        model_name = "Gemma3"
 
+    return OpenAIChatModel(
+        model_name=model_name,
+        provider=provider,
+    )
 
-def finalize(responses: list, clean: bool = True, name: str = "responses.json") -> None:
-    """Save responses and clean up if needed."""
-    with open(name, "w") as f:  # Save responses in case of error
-        json.dump([response.model_dump() for response in responses], f, indent=4)
-    if clean:
-        shutil.rmtree(Path("output"))
 
+# Maximum number of repositories evaluated at the same time
+LLM_JUDGE_CONCURRENCY = int(os.getenv("LLM_JUDGE_CONCURRENCY", "8"))
+# Number of repositories evaluated in a single LLM call by batch commands, the
+# packed repositories of a batch must fit in the context window of the model
+LLM_JUDGE_BATCH_SIZE = int(os.getenv("LLM_JUDGE_BATCH_SIZE", "1"))
+# Requests per minute sent to the provider, 0 for no limit
+LLM_JUDGE_RPM = int(os.getenv("LLM_JUDGE_RPM", "0"))
+# Remaining repositories are skipped after this many failures in a row
+LLM_JUDGE_MAX_CONSECUTIVE_FAILURES = int(
+    os.getenv("LLM_JUDGE_MAX_CONSECUTIVE_FAILURES", "5")
+)
 
-def repo_context(ctx: RunContext[TADependency], context_type: str = "code") -> str:
-    repo_content = get_repo_content(ctx.deps.repo_link, ctx.deps.repomix)
-    return f"{context_type}:\n\n{repo_content}"
+llm_rate_limiter = RateLimiter(LLM_JUDGE_RPM)
 
+# Serializes mixed responses, each with the fields of its own model
+responses_adapter = TypeAdapter(list[SerializeAsAny[BaseModel]])
 
-def create_code_quality_agent() -> Agent[TADependency, CodeQualityResponse]:
-    """Create an agent focused on code quality evaluation."""
-    agent = Agent(
-        model=model,
-        deps_type=TADependency,
-        output_type=CodeQualityResponse,
-        system_prompt="""You are a teaching assistant evaluating code quality for a university MLOps course.
+LLM_CACHE_DIR = Path(".cache/llm")
+# Cached evaluations are redone after this long
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+CODE_QUALITY_SYSTEM_PROMPT = """You are a teaching assistant evaluating code quality for a university MLOps course.
 
 Evaluate the code based on:
 - Code structure and organization
@@ -78,23 +111,9 @@ SCORE (1-5):
 
 SUMMARY: 1-2 paragraphs (max 200 words) on code quality findings and suggestions.
 CONFIDENCE (1-10): Your confidence in the assessment.
-""",
-    )
-
-    @agent.system_prompt
-    async def add_repo_context(ctx: RunContext[TADependency]) -> str:
-        return repo_context(ctx, context_type="code")
+"""
 
-    return agent
-
-
-def create_unit_testing_agent() -> Agent[TADependency, UnitTestingResponse]:
-    """Create an agent focused on unit testing evaluation."""
-    agent = Agent(
-        model=model,
-        deps_type=TADependency,
-        output_type=UnitTestingResponse,
-        system_prompt="""You are a teaching assistant evaluating unit testing for a university MLOps course.
+UNIT_TESTING_SYSTEM_PROMPT = """You are a teaching assistant evaluating unit testing for a university MLOps course.
 
 Evaluate testing based on:
 - Test coverage (unit, integration, E2E tests)
@@ -113,23 +132,9 @@ SCORE (1-5):
 
 SUMMARY: 1-2 paragraphs (max 200 words) on testing findings and suggestions.
 CONFIDENCE (1-10): Your confidence in the assessment.
-""",
-    )
-
-    @agent.system_prompt
-    async def add_repo_context(ctx: RunContext[TADependency]) -> str:
-        return repo_context(ctx, context_type="tests")
+"""
 
-    return agent
-
-
-def create_cicd_agent() -> Agent[TADependency, CICDResponse]:
-    """Create an agent focused on CI/CD evaluation."""
-    agent = Agent(
-        model=model,
-        deps_type=TADependency,
-        output_type=CICDResponse,
-        system_prompt="""You are a teaching assistant evaluating CI/CD for a university MLOps course.
+CICD_SYSTEM_PROMPT = """You are a teaching assistant evaluating CI/CD for a university MLOps course.
 
 Evaluate CI/CD based on:
 - GitHub Actions/workflow configuration
@@ -148,118 +153,15 @@ SCORE (1-5):
 
 SUMMARY: 1-2 paragraphs (max 200 words) on CI/CD findings and suggestions.
 CONFIDENCE (1-10): Your confidence in the assessment.
-""",
-    )
-
-    @agent.system_prompt
-    async def add_repo_context(ctx: RunContext[TADependency]) -> str:
-        return repo_context(ctx, context_type="CI/CD configuration")
-
-    return agent
-
+"""
 
-def codebase(repo_link: str) -> TACodeResponse:
-    code_quality_agent = create_code_quality_agent()
-    unit_testing_agent = create_unit_testing_agent()
-    cicd_agent = create_cicd_agent()
+BATCH_SYSTEM_PROMPT = """
+You are given the repositories of several groups, each under a "### GROUP <n>" heading.
+Evaluate every group independently and return exactly one item per group, in the order
+the groups are given.
+"""
 
-    try:
-        # Code quality evaluation - focus on source code
-        logger.info(f"Evaluating code quality for repository {repo_link}")
-        code_quality_deps = TADependency(
-            repo_link=repo_link,
-            repomix=RepoMix(
-                include=["**/*.py"],
-                ignore=RepoMix.Ignore(
-                    customPatterns=[
-                        "tests/**",
-                        "test_*.py",
-                        "*_test.py",
-                        ".github/**",
-                        "**/*.ipynb",
-                        "**/__pycache__/**",
-                        "*.pyc",
-                        "data/**",
-                        "**/*.csv",
-                        "reports/**",
-                    ]
-                ),
-            ),
-        )
-        code_quality_result = code_quality_agent.run_sync(
-            "Evaluate the code quality of this repository.",
-            deps=code_quality_deps,
-        )
-        logger.info(f"Code quality score: {code_quality_result.output.score}")
-
-        # Unit testing evaluation - focus on test files
-        logger.info(f"Evaluating unit testing for repository {repo_link}")
-        unit_testing_deps = TADependency(
-            repo_link=repo_link,
-            repomix=RepoMix(
-                include=["tests/**/*.py", "test_*.py", "*_test.py", "**/*test*.py"],
-                ignore=RepoMix.Ignore(
-                    customPatterns=[
-                        ".github/**",
-                        "**/*.ipynb",
-                        "**/__pycache__/**",
-                        "*.pyc",
-                    ]
-                ),
-            ),
-        )
-        unit_testing_result = unit_testing_agent.run_sync(
-            "Evaluate the unit testing in this repository.",
-            deps=unit_testing_deps,
-        )
-        logger.info(f"Unit testing score: {unit_testing_result.output.score}")
-
-        # CI/CD evaluation - focus on workflow files
-        logger.info(f"Evaluating CI/CD for repository {repo_link}")
-        cicd_deps = TADependency(
-            repo_link=repo_link,
-            repomix=RepoMix(
-                include=[
-                    ".github/workflows/*.yml",
-                    ".github/workflows/*.yaml",
-                    "Dockerfile",
-                    "**/Dockerfile*",
-                    "docker-compose*.yml",
-                    "docker-compose*.yaml",
-                    ".dockerignore",
-                ],
-                ignore=RepoMix.Ignore(customPatterns=[]),
-            ),
-        )
-        cicd_result = cicd_agent.run_sync(
-            "Evaluate the CI/CD setup in this repository.",
-            deps=cicd_deps,
-        )
-        logger.info(f"CI/CD score: {cicd_result.output.score}")
-
-        # Aggregate results
-        final_response = TACodeResponse.from_sub_agents(
-            code_quality_response=code_quality_result.output,
-            unit_testing_response=unit_testing_result.output,
-            cicd_response=cicd_result.output,
-        )
-
-        logger.info(f"Overall score: {final_response.overall_score}")
-    except Exception as e:
-        logger.error(f"Failed for repository {repo_link}: {e}")
-        shutil.rmtree(Path("output"))
-        raise e
-    shutil.rmtree(Path("output"))
-    return final_response
-
-
-def report(repo_link: str) -> TAReportResponse:
-    """Main function to evaluate the report of a repository."""
-    ta_agent = Agent(
-        model=model,
-        deps_type=TADependency,
-        output_type=TAReportResponse,
-        system_prompt="""
+REPORT_SYSTEM_PROMPT = """
         You are a teaching assistant for a university level course on machine learning operations. You are tasked with
         correcting a student's report which is provided in markdown format. The report is a template consisting of 31
         questions and are fologrmatted into a couple of sections:  Group information, Coding environment, Version
@@ -277,37 +179,537 @@ def report(repo_link: str) -> TAReportResponse:
         you need to return how many of the 52 items from the checklist were completed. Provide also a summary of the
         overall report evaluation using no more than 300 words. Finally, return a grading score from 1-10 and your
         confidence in the grading from 1-10.
-        """,
+        """
+
+
+# Code quality evaluation - focus on source code
+CODE_QUALITY_REPOMIX = RepoMix(
+    include=["**/*.py"],
+    ignore=RepoMix.Ignore(
+        customPatterns=[
+            "tests/**",
+            "test_*.py",
+            "*_test.py",
+            ".github/**",
+            "**/*.ipynb",
+            "**/__pycache__/**",
+            "*.pyc",
+            "data/**",
+            "**/*.csv",
+            "reports/**",
+        ]
+    ),
+)
+
+# Unit testing evaluation - focus on test files
+UNIT_TESTING_REPOMIX = RepoMix(
+    include=["tests/**/*.py", "test_*.py", "*_test.py", "**/*test*.py"],
+    ignore=RepoMix.Ignore(
+        customPatterns=[
+            ".github/**",
+            "**/*.ipynb",
+            "**/__pycache__/**",
+            "*.pyc",
+        ]
+    ),
+)
+
+# CI/CD evaluation - focus on workflow files
+CICD_REPOMIX = RepoMix(
+    include=[
+        ".github/workflows/*.yml",
+        ".github/workflows/*.yaml",
+        "Dockerfile",
+        "**/Dockerfile*",
+        "docker-compose*.yml",
+        "docker-compose*.yaml",
+        ".dockerignore",
+    ],
+    ignore=RepoMix.Ignore(customPatterns=[]),
+)
+
+
+@dataclass(frozen=True, eq=False)
+class AgentSpec:
+    """Specification of a sub-agent evaluating one aspect of a codebase."""
+
+    # Matches the `<name>_response` argument of TACodeResponse.from_sub_agents
+    name: str
+    label: str
+    system_prompt: str
+    prompt: str
+    batch_prompt: str
+    context_type: str
+    repomix: RepoMix
+    output_type: type[BaseModel]
+    batch_type: type[BaseModel]
+
+
+SPECS = (
+    AgentSpec(
+        name="code_quality",
+        label="Code quality",
+        system_prompt=CODE_QUALITY_SYSTEM_PROMPT,
+        prompt="Evaluate the code quality of this repository.",
+        batch_prompt="Evaluate the code quality of each group's repository.",
+        context_type="code",
+        repomix=CODE_QUALITY_REPOMIX,
+        output_type=CodeQualityResponse,
+        batch_type=BatchCodeQualityResponse,
+    ),
+    AgentSpec(
+        name="unit_testing",
+        label="Unit testing",
+        system_prompt=UNIT_TESTING_SYSTEM_PROMPT,
+        prompt="Evaluate the unit testing in this repository.",
+        batch_prompt="Evaluate the unit testing in each group's repository.",
+        context_type="tests",
+        repomix=UNIT_TESTING_REPOMIX,
+        output_type=UnitTestingResponse,
+        batch_type=BatchUnitTestingResponse,
+    ),
+    AgentSpec(
+        name="cicd",
+        label="CI/CD",
+        system_prompt=CICD_SYSTEM_PROMPT,
+        prompt="Evaluate the CI/CD setup in this repository.",
+        batch_prompt="Evaluate the CI/CD setup in each group's repository.",
+        context_type="CI/CD configuration",
+        repomix=CICD_REPOMIX,
+        output_type=CICDResponse,
+        batch_type=BatchCICDResponse,
+    ),
+)
+
+# Report evaluation - only the report itself
+REPORT_REPOMIX = RepoMix(include=["reports/README.md"])
+
+# The repository is packed once with the union of the includes and each agent,
+# including the report agent, filters its own files from that pack
+REPO_SCAN = RepoMix(
+    include=sorted(
+        {
+            *(pattern for spec in SPECS for pattern in spec.repomix.include),
+            *REPORT_REPOMIX.include,
+        }
     )
+)
 
-    @ta_agent.system_prompt
-    async def add_report_information(ctx: RunContext[TADependency]) -> str:
-        repo_content = get_repo_content(ctx.deps.repo_link, ctx.deps.repomix)
-        return f"""
-        Report Content:\n\n
-        {repo_content}
-        """
 
-    deps = TADependency(
-        repo_link=repo_link, repomix=RepoMix(include=["reports/README.md"])
+@cache
+def list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    """Returns the adapter serializing lists of a response model."""
+    return TypeAdapter(list[model])
+
+
+def finalize(responses: list[BaseModel], name: str = "responses.json") -> None:
+    """Save responses."""
+    # Serialized in one pass straight to JSON bytes, without intermediate dicts
+    response_types = {type(response) for response in responses}
+    adapter = (
+        list_adapter(response_types.pop())
+        if len(response_types) == 1
+        else responses_adapter
+    )
+    path = Path(name)
+    if not path.suffix:
+        path = path.with_suffix(".json")
+    path.write_bytes(adapter.dump_json(responses, indent=2))
+
+
+# One event loop per thread, reused by every synchronous entry point
+_event_loops = threading.local()
+
+
+def run_sync[T](coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the event loop of the calling thread.
+
+    The loop is created on first use and kept, so repeated calls neither set up
+    a new loop each time nor strand the model's connections on a closed one.
+    """
+    runner = getattr(_event_loops, "runner", None)
+    if runner is None:
+        runner = _event_loops.runner = asyncio.Runner()
+    return runner.run(coroutine)
+
+
+async def load_repo_contents(*deps: TADependency) -> list[TADependency]:
+    """Returns the dependencies with their repository content precomputed.
+
+    The contents are read one after the other in a worker thread, off the event
+    loop, so that dependencies sharing a scan pack the repository only once.
+    """
+
+    def load() -> list[TADependency]:
+        return [
+            dep
+            if dep.repo_content is not None
+            else dep.model_copy(
+                update={
+                    "repo_content": get_repo_content(
+                        dep.repo_link, dep.repomix, dep.scan
+                    )
+                }
+            )
+            for dep in deps
+        ]
+
+    return await asyncio.to_thread(load)
+
+
+def is_transient_error(exception: BaseException) -> bool:
+    """Returns whether a failed LLM request is worth retrying."""
+    if isinstance(exception, ModelHTTPError):
+        return exception.status_code == 429 or exception.status_code >= 500
+    # pydantic-ai wraps connection errors and timeouts of the client
+    if isinstance(exception, ModelAPIError):
+        exception = exception.__cause__
+    return isinstance(exception, (APIConnectionError, TimeoutError))
+
+
+@retry(
+    retry=retry_if_exception(is_transient_error),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    before_sleep=lambda state: logger.warning(
+        f"LLM request failed with {state.outcome.exception()!r}, "
+        f"retrying in {state.next_action.sleep:.1f}s"
+    ),
+    reraise=True,
+)
+async def run_agent(agent: Agent, prompt: str, **kwargs):
+    """Run an agent under the rate limit, retrying transient provider errors."""
+    async with llm_rate_limiter:
+        return await agent.run(prompt, **kwargs)
+
+
+async def cached_run[T: BaseModel](
+    agent: Agent[TADependency, T],
+    system_prompt: str,
+    prompt: str,
+    deps: TADependency,
+    context_type: str = "code",
+) -> tuple[T, RunUsage | None]:
+    """Run an agent, reusing a cached output for identical inputs if enabled.
+
+    The repository content is passed as instructions of the run, labeled by
+    `context_type`, so agents carry no per-call system prompt functions. The cache
+    is opt-in via `LLM_JUDGE_CACHE` and keyed by the model, the prompts and the
+    repository content. Returns the output and the usage of the run, which is None
+    if the output came from the cache.
+    """
+    (deps,) = await load_repo_contents(deps)
+    context = f"{context_type}:\n\n{deps.repo_content}"
+    if not LLM_JUDGE_CACHE:
+        result = await run_agent(agent, prompt, deps=deps, instructions=context)
+        return result.output, result.usage()
+
+    prune_cache(LLM_CACHE_DIR, LLM_CACHE_TTL_SECONDS)
+    key = hashlib.sha256(
+        f"{get_model().model_name}\n{system_prompt}\n{prompt}\n{context}".encode()
+    ).hexdigest()
+    cache_path = LLM_CACHE_DIR / f"{key}.json"
+    if (
+        cache_path.exists()
+        and time.time() - cache_path.stat().st_mtime < LLM_CACHE_TTL_SECONDS
+    ):
+        logger.info(f"Using cached {agent.output_type.__name__} for {deps.repo_link}")
+        return agent.output_type.model_validate_json(cache_path.read_bytes()), None
+
+    result = await run_agent(agent, prompt, deps=deps, instructions=context)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(result.output.model_dump_json())
+    return result.output, result.usage()
+
+
+async def batched_run(spec: AgentSpec, deps: list[TADependency]) -> list[BaseModel]:
+    """Run the agent of a spec over several repositories in a single LLM call.
+
+    The repositories are labeled by group in one system prompt and the model
+    returns the batch type of the spec, holding one item per repository. Falls
+    back to one call per repository if the provider rejects the batch, for instance
+    for exceeding the context length, or the model returns an invalid batch or the
+    wrong number of items.
+    """
+    if len(deps) > 1:
+        deps = await load_repo_contents(*deps)
+        batch_agent = Agent(
+            model=get_model(),
+            output_type=spec.batch_type,
+            system_prompt=[
+                spec.system_prompt,
+                BATCH_SYSTEM_PROMPT,
+                *(
+                    f"### GROUP {i}\n\n{spec.context_type}:\n\n{dep.repo_content}"
+                    for i, dep in enumerate(deps, start=1)
+                ),
+            ],
+        )
+        try:
+            result = await run_agent(batch_agent, spec.batch_prompt)
+            if len(result.output.items) == len(deps):
+                return result.output.items
+            logger.warning(
+                f"Expected {len(deps)} batched {spec.label} items, "
+                f"got {len(result.output.items)}. Falling back to single calls."
+            )
+        except (UnexpectedModelBehavior, ModelHTTPError) as e:
+            # Transient errors have already used up their retries
+            if is_transient_error(e):
+                raise
+            logger.warning(f"Batched call failed: {e}. Falling back to single calls.")
+
+    agent = create_agent(spec)
+    responses = await asyncio.gather(
+        *(
+            cached_run(agent, spec.system_prompt, spec.prompt, dep, spec.context_type)
+            for dep in deps
+        )
+    )
+    return [output for output, _ in responses]
+
+
+@cache
+def create_agent(spec: AgentSpec) -> Agent[TADependency, BaseModel]:
+    """Create the agent of a spec, shared by every evaluation."""
+    return Agent(
+        model=get_model(),
+        deps_type=TADependency,
+        output_type=spec.output_type,
+        system_prompt=spec.system_prompt,
     )
+
+
+def codebase_deps(repo_link: str) -> list[TADependency]:
+    """Returns the dependencies of each spec for a repository, in order of SPECS."""
+    return [
+        TADependency(repo_link=repo_link, repomix=spec.repomix, scan=REPO_SCAN)
+        for spec in SPECS
+    ]
+
+
+def combine_responses(responses: list[BaseModel]) -> TACodeResponse:
+    """Aggregate the sub-agent responses, in order of SPECS, into one response."""
+    return TACodeResponse.from_sub_agents(
+        **{
+            f"{spec.name}_response": response
+            for spec, response in zip(SPECS, responses, strict=True)
+        }
+    )
+
+
+async def codebase_async(repo_link: str) -> TACodeResponse:
+    """Evaluate the codebase of a repository, running the sub-agents concurrently."""
     try:
-        result = ta_agent.run_sync("What do you think of the groups report?", deps=deps)
-        result.output.request_usage = result.usage()
-        pprint(result.output)
+        deps = await load_repo_contents(*codebase_deps(repo_link))
+
+        # The sub-agents share no data, so their LLM round-trips can overlap
+        logger.info(
+            f"Evaluating code quality, unit testing and CI/CD for repository {repo_link}"
+        )
+        results = await asyncio.gather(
+            *(
+                cached_run(
+                    create_agent(spec),
+                    spec.system_prompt,
+                    spec.prompt,
+                    dep,
+                    spec.context_type,
+                )
+                for spec, dep in zip(SPECS, deps)
+            )
+        )
+        responses = [output for output, _ in results]
+        for spec, response in zip(SPECS, responses):
+            logger.info(f"{spec.label} score: {response.score}")
+
+        # Aggregate results
+        final_response = combine_responses(responses)
+
+        logger.info(f"Overall score: {final_response.overall_score}")
+        # Only formatted when DEBUG logging is enabled
+        logger.opt(lazy=True).debug(
+            "Codebase evaluation: {}", lambda: final_response.model_dump_json(indent=2)
+        )
     except Exception as e:
-        shutil.rmtree(Path("output"))
+        logger.error(f"Failed for repository {repo_link}: {e}")
         raise e
-    shutil.rmtree(Path("output"))
-    return result.output
+    return final_response
+
+
+def codebase(repo_link: str) -> TACodeResponse:
+    """Main function to evaluate the codebase of a repository."""
+    return run_sync(codebase_async(repo_link))
+
+
+async def gather_bounded[A, T](
+    evaluate: Callable[[A], Awaitable[T]], items: list[A], concurrency: int
+) -> list[T | BaseException]:
+    """Evaluate several items concurrently, at most `concurrency` at a time.
+
+    A failing item does not cancel the others, its exception is returned in its
+    place instead. After too many failures in a row the remaining items are
+    skipped.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    consecutive_failures = 0
+
+    async def process(item: A) -> T:
+        nonlocal consecutive_failures
+        async with semaphore:
+            # Stop hammering a provider that keeps failing
+            if consecutive_failures >= LLM_JUDGE_MAX_CONSECUTIVE_FAILURES:
+                logger.error(f"Skipping {item} after {consecutive_failures} failures")
+                raise RuntimeError(f"Skipped after {consecutive_failures} failures")
+            try:
+                result = await evaluate(item)
+            except Exception:
+                consecutive_failures += 1
+                raise
+            consecutive_failures = 0
+            return result
+
+    return await asyncio.gather(
+        *(process(item) for item in items), return_exceptions=True
+    )
+
+
+async def codebase_group_async(repo_links: list[str]) -> list[TACodeResponse]:
+    """Evaluate the codebases of several repositories with one LLM call per agent."""
+    deps = await asyncio.gather(
+        *(load_repo_contents(*codebase_deps(repo_link)) for repo_link in repo_links)
+    )
+
+    logger.info(f"Evaluating code quality, unit testing and CI/CD for {repo_links}")
+    responses = await asyncio.gather(
+        *(
+            batched_run(spec, [repo_deps[i] for repo_deps in deps])
+            for i, spec in enumerate(SPECS)
+        )
+    )
+    return [
+        combine_responses(list(repo_responses)) for repo_responses in zip(*responses)
+    ]
+
+
+def save_results(
+    repo_links: list[str], results: list[BaseModel | BaseException], name: str
+) -> None:
+    """Log the failed repositories and save the successful responses in one dump."""
+    for repo_link, result in zip(repo_links, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed for repository {repo_link}: {result}")
+    finalize(
+        [result for result in results if not isinstance(result, BaseException)],
+        name=name,
+    )
+
+
+def codebase_batch(
+    repo_links: list[str],
+    concurrency: int = LLM_JUDGE_CONCURRENCY,
+    batch_size: int = LLM_JUDGE_BATCH_SIZE,
+    output: str | None = None,
+) -> list[TACodeResponse | BaseException]:
+    """Evaluate the codebases of several repositories concurrently.
+
+    With a batch size above one, that many repositories share each LLM call. The
+    successful responses are saved to `output` if given.
+    """
+    if batch_size <= 1:
+        results = run_sync(gather_bounded(codebase_async, repo_links, concurrency))
+    else:
+        groups = [
+            repo_links[i : i + batch_size]
+            for i in range(0, len(repo_links), batch_size)
+        ]
+        group_results = run_sync(
+            gather_bounded(codebase_group_async, groups, concurrency)
+        )
+        # A failed group fails each of its repositories
+        results = [
+            response
+            for group, result in zip(groups, group_results)
+            for response in (
+                [result] * len(group) if isinstance(result, BaseException) else result
+            )
+        ]
+    if output is not None:
+        save_results(repo_links, results, output)
+    return results
+
+
+@lru_cache(maxsize=1)
+def create_report_agent() -> Agent[TADependency, TAReportResponse]:
+    """Create an agent evaluating the report of a repository."""
+    return Agent(
+        model=get_model(),
+        deps_type=TADependency,
+        output_type=TAReportResponse,
+        system_prompt=REPORT_SYSTEM_PROMPT,
+    )
+
+
+async def report_async(repo_link: str) -> TAReportResponse:
+    """Evaluate the report of a repository."""
+    ta_agent = create_report_agent()
+
+    deps = TADependency(repo_link=repo_link, repomix=REPORT_REPOMIX, scan=REPO_SCAN)
+    output, usage = await cached_run(
+        ta_agent,
+        REPORT_SYSTEM_PROMPT,
+        "What do you think of the groups report?",
+        deps,
+        "Report Content",
+    )
+    output = output.model_copy(update={"request_usage": usage})
+    # Only formatted when DEBUG logging is enabled
+    logger.opt(lazy=True).debug(
+        "Report evaluation: {}", lambda: output.model_dump_json(indent=2)
+    )
+    return output
+
+
+def report(repo_link: str) -> TAReportResponse:
+    """Main function to evaluate the report of a repository."""
+    return run_sync(report_async(repo_link))
+
+
+def report_batch(
+    repo_links: list[str],
+    concurrency: int = LLM_JUDGE_CONCURRENCY,
+    output: str | None = None,
+) -> list[TAReportResponse | BaseException]:
+    """Evaluate the reports of several repositories concurrently.
+
+    The successful responses are saved to `output` if given.
+    """
+    results = run_sync(gather_bounded(report_async, repo_links, concurrency))
+    if output is not None:
+        save_results(repo_links, results, output)
+    return results
 
 
 if __name__ == "__main__":
+    import sys
+
     import typer
 
     app = typer.Typer(add_completion=False, pretty_exceptions_enable=False)
 
+    @app.callback()
+    def main(
+        verbose: bool = typer.Option(
+            False, "--verbose", "-v", help="Log full evaluations."
+        ),
+    ) -> None:
+        """Evaluate the codebases and reports of student repositories."""
+        logger.remove()
+        logger.add(sys.stderr, level="DEBUG" if verbose else "INFO")
+
     app.command()(codebase)
+    app.command()(codebase_batch)
     app.command()(report)
+    app.command()(report_batch)
 
     app()  # type: ignore
@@ -1,7 +1,7 @@
-import json
 from pathlib import Path
 
-from pydantic import BaseModel, Field
+import orjson
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic_ai.usage import RunUsage
 
 
@@ -38,8 +38,13 @@ class RepoMix(BaseModel):
 
     def dump_json(self, file_path: str) -> None:
         """Dump the configuration to a JSON file."""
-        with Path(file_path).open("w") as file:
-            json.dump(self.model_dump(), file, indent=4)
+        Path(file_path).write_bytes(
+            orjson.dumps(self.model_dump(), option=orjson.OPT_INDENT_2)
+        )
+
+
+# Responses are parsed from model output and never changed afterwards
+RESPONSE_CONFIG = ConfigDict(frozen=True, extra="ignore")
 
 
 class TADependency(BaseModel):
@@ -47,11 +52,17 @@ class TADependency(BaseModel):
 
     repo_link: str
     repomix: RepoMix
+    # Shared repomix run that `repomix` is filtered from, if any
+    scan: RepoMix | None = None
+    # Packed repository content, loaded once before the agents run
+    repo_content: str | None = None
 
 
 class CodeQualityResponse(BaseModel):
     """Model for the response from the code quality agent."""
 
+    model_config = RESPONSE_CONFIG
+
     score: int = Field(
         ..., ge=1, le=5, description="Score the code quality on a scale from 1 to 5"
     )
@@ -66,6 +77,8 @@ class CodeQualityResponse(BaseModel):
 class UnitTestingResponse(BaseModel):
     """Model for the response from the unit testing agent."""
 
+    model_config = RESPONSE_CONFIG
+
     score: int = Field(
         ...,
         ge=1,
@@ -83,6 +96,8 @@ class UnitTestingResponse(BaseModel):
 class CICDResponse(BaseModel):
     """Model for the response from the CI/CD agent."""
 
+    model_config = RESPONSE_CONFIG
+
     score: int = Field(
         ...,
         ge=1,
@@ -97,9 +112,41 @@ class CICDResponse(BaseModel):
     )
 
 
+class BatchCodeQualityResponse(BaseModel):
+    """Model for the responses from the code quality agent for several groups."""
+
+    model_config = RESPONSE_CONFIG
+
+    items: list[CodeQualityResponse] = Field(
+        ..., description="One code quality evaluation per group, in the given order"
+    )
+
+
+class BatchUnitTestingResponse(BaseModel):
+    """Model for the responses from the unit testing agent for several groups."""
+
+    model_config = RESPONSE_CONFIG
+
+    items: list[UnitTestingResponse] = Field(
+        ..., description="One unit testing evaluation per group, in the given order"
+    )
+
+
+class BatchCICDResponse(BaseModel):
+    """Model for the responses from the CI/CD agent for several groups."""
+
+    model_config = RESPONSE_CONFIG
+
+    items: list[CICDResponse] = Field(
+        ..., description="One CI/CD evaluation per group, in the given order"
+    )
+
+
 class TACodeResponse(BaseModel):
     """Model for the response from the TA agent for the code."""
 
+    model_config = RESPONSE_CONFIG
+
     code_quality: int = Field(
         ..., ge=1, le=5, description="Score the code quality on a scale from 1 to 5"
     )
@@ -171,6 +218,8 @@ class TACodeResponse(BaseModel):
 class TAReportResponse(BaseModel):
     """Model for the response from the TA agent for the report."""
 
+    model_config = RESPONSE_CONFIG
+
     checklist: int = Field(
         ..., ge=0, le=52, description="How many items from the checklist were completed"
     )
@@ -1,35 +1,249 @@
+import asyncio
+import hashlib
 import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from fnmatch import fnmatchcase
+from functools import cache, lru_cache
 from pathlib import Path
 
 from loguru import logger
 
 from mlops_mentor.llm_judge.models import RepoMix
 
+REPOMIX_CACHE_DIR = Path(".cache/repomix")
+# Set LLM_JUDGE_CACHE=1 to reuse repomix packs and judge results across runs
+LLM_JUDGE_CACHE = os.getenv("LLM_JUDGE_CACHE", "0") == "1"
+# Packs of repositories whose HEAD could not be resolved expire after this long
+REPOMIX_CACHE_TTL_SECONDS = int(os.getenv("REPOMIX_CACHE_TTL_SECONDS", "86400"))
+# Cached packs untouched for this long are deleted, which bounds the cache size
+REPOMIX_CACHE_MAX_AGE_SECONDS = int(
+    os.getenv("REPOMIX_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600))
+)
+# Budget for the packed content sent to the model, the default leaves room for the
+# prompts and the answer in the 32k context of the local model
+LLM_JUDGE_MAX_CONTENT_TOKENS = int(os.getenv("LLM_JUDGE_MAX_CONTENT_TOKENS", "24000"))
+CHARS_PER_TOKEN = 4  # Rough average for code and English text
+MAX_FILE_LINES = 512  # Longer files are mostly data or generated code
 
-def call_repomix(
-    repo: str, repomix_config: RepoMix, out_folder: str = "output"
-) -> None:
-    """Call repomix on a repository."""
-    repomix_config.dump_json("repomix.config.json")
-    logger.info(f"Running repomix on {repo}")
-    current_dir = os.getcwd()
-    os.system(
-        f"repomix -c {current_dir}/repomix.config.json --remote {repo} --verbose >> output.log"
+# Header and opening fence of a file section in the markdown output of repomix
+_FILE_SECTION = re.compile(r"^## File: (.+)\n(`{3,})[^\n]*\n", re.MULTILINE)
+
+
+class RateLimiter:
+    """Async context manager spacing calls out to at most `rate` per minute.
+
+    A rate of zero disables the limit.
+    """
+
+    def __init__(self, rate: int) -> None:
+        self.interval = 60 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def __aenter__(self) -> None:
+        now = time.monotonic()
+        # Reserve the next free slot before sleeping so that waiters queue up
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+@cache
+def prune_cache(directory: Path, max_age: float) -> None:
+    """Delete the files in a cache directory older than `max_age` seconds.
+
+    Runs at most once per directory and process.
+    """
+    if not directory.is_dir():
+        return
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in directory.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:  # Pruned by a concurrent process
+            continue
+    if removed:
+        logger.info(f"Removed {removed} expired entries from {directory}")
+
+
+def call_repomix(repo: str, repomix_config: RepoMix) -> str:
+    """Call repomix on a repository and return the packed output.
+
+    Every call runs in its own temporary working directory holding the config,
+    log and output files, so concurrent calls never clobber each other.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="repomix_"))
+    try:
+        output_file = workdir / "repomix-output.md"
+        log_path = workdir / "output.log"
+        repomix_config.model_copy(
+            update={
+                "output": repomix_config.output.model_copy(
+                    update={"filePath": output_file.name}
+                )
+            }
+        ).dump_json(str(workdir / "repomix.config.json"))
+        logger.info(f"Running repomix on {repo}")
+        # Arguments are passed without a shell, so the repository is never interpreted
+        with log_path.open("w") as log:
+            result = subprocess.run(
+                ["repomix", "-c", "repomix.config.json", "--remote", repo, "--verbose"],
+                cwd=workdir,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                check=False,
+            )
+        if result.returncode != 0:
+            logger.error(f"repomix failed for {repo}: {log_path.read_text()[-1000:]}")
+            raise RuntimeError(
+                f"repomix failed for {repo} with code {result.returncode}"
+            )
+        return output_file.read_text()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def get_remote_head(repo: str) -> str | None:
+    """Returns the commit SHA of the remote HEAD, or None if it cannot be resolved."""
+    result = subprocess.run(
+        ["git", "ls-remote", repo, "HEAD"],
+        capture_output=True,
+        text=True,
+        check=False,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},  # Fail instead of prompting
     )
-    repo_name = "_".join(repo.split("/")[-2:])
-    os.system(f"mkdir -p  {out_folder}/{repo_name}")
-    os.system(f"mv output.log {out_folder}/{repo_name}/output.log")
-    os.system(f"mv repomix-output.md {out_folder}/{repo_name}/repomix-output.md")
-    os.system("rm repomix.config.json")
-
-
-def get_repo_content(repository: str, repomix_config: RepoMix) -> str:
-    """Get the code from a repository."""
-    if repository.startswith("https://github.com"):
-        call_repomix(repository, repomix_config, out_folder="output")
-        repo_name = "_".join(repository.split("/")[-2:])
-        path = Path(f"output/{repo_name}/repomix-output.md")
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout.split()[0]
+
+
+@lru_cache(maxsize=256)
+def pack_repo(repo: str, repomix_config_json: str) -> str:
+    """Pack a remote repository with repomix, reusing packs of the same commit.
+
+    Packs are memoized in-process. With `LLM_JUDGE_CACHE` enabled they are also
+    persisted on disk keyed by the repository, its current HEAD commit and the
+    repomix configuration, so reruns against an unchanged repository skip repomix
+    entirely. If the HEAD cannot be resolved a pack on disk is only reused while it
+    is younger than the cache TTL.
+    """
+    if not LLM_JUDGE_CACHE:
+        return call_repomix(repo, RepoMix.model_validate_json(repomix_config_json))
+
+    prune_cache(REPOMIX_CACHE_DIR, REPOMIX_CACHE_MAX_AGE_SECONDS)
+    head = get_remote_head(repo)
+    key = hashlib.sha256(f"{repo}\n{head}\n{repomix_config_json}".encode()).hexdigest()
+    cache_path = REPOMIX_CACHE_DIR / f"{key}.md"
+    if cache_path.exists():
+        age = time.time() - cache_path.stat().st_mtime
+        if head is not None or age < REPOMIX_CACHE_TTL_SECONDS:
+            logger.info(f"Using cached repomix output for {repo}")
+            return cache_path.read_text()
+
+    content = call_repomix(repo, RepoMix.model_validate_json(repomix_config_json))
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(content)
+    return content
+
+
+def split_packed_files(packed: str) -> dict[str, str]:
+    """Split the markdown output of repomix into its file sections by path."""
+    files = {}
+    position = 0
+    while match := _FILE_SECTION.search(packed, position):
+        # repomix picks a fence longer than any backtick run in the file content
+        fence = match.group(2)
+        end = packed.find(f"\n{fence}", match.end() - 1)
+        if end == -1:
+            break
+        position = end + 1 + len(fence)
+        files[match.group(1)] = packed[match.start() : position]
+    return files
+
+
+def matches_any(path: str, patterns: list[str]) -> bool:
+    """Returns whether a file path matches any of the repomix glob patterns."""
+    name = path.rsplit("/", 1)[-1]
+    return any(
+        fnmatchcase(path, pattern)
+        or fnmatchcase(path, pattern.removeprefix("**/"))  # `**/` also matches the root
+        or ("/" not in pattern and fnmatchcase(name, pattern))
+        for pattern in patterns
+    )
+
+
+@lru_cache(maxsize=256)
+def scan_repo(repo: str, scan_config_json: str) -> dict[str, str]:
+    """Pack a remote repository once and return its file sections by path."""
+    return split_packed_files(pack_repo(repo, scan_config_json))
+
+
+def fit_to_budget(content: str, max_tokens: int = LLM_JUDGE_MAX_CONTENT_TOKENS) -> str:
+    """Shrink packed repository content to roughly `max_tokens` tokens.
+
+    Content within budget is returned unchanged. Otherwise files longer than
+    `MAX_FILE_LINES` lines are cut short and files that no longer fit are dropped,
+    listing the omitted paths at the end.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(content) <= max_chars:
+        return content
+    files = split_packed_files(content)
+    if not files:
+        return content[:max_chars]
+
+    kept, omitted, size = [], [], 0
+    for path, section in files.items():
+        lines = section.splitlines()
+        # Header and both fences wrap the lines of the file
+        if len(lines) > MAX_FILE_LINES + 3:
+            section = "\n".join(
+                [
+                    *lines[: MAX_FILE_LINES + 2],
+                    f"... {len(lines) - MAX_FILE_LINES - 3} more lines truncated",
+                    lines[-1],
+                ]
+            )
+        if size + len(section) > max_chars:
+            omitted.append(path)
+            continue
+        kept.append(section)
+        size += len(section) + 2
+    if omitted:
+        logger.warning(f"Omitted {len(omitted)} files to fit the content budget")
+        kept.append(f"Files omitted to fit the context window: {', '.join(omitted)}")
+    return "\n\n".join(kept)
+
+
+def get_repo_content(
+    repository: str, repomix_config: RepoMix, scan_config: RepoMix | None = None
+) -> str:
+    """Get the code from a repository, shrunk to fit the content budget.
+
+    If a scan configuration is given the repository is packed once with it and the
+    files selected by `repomix_config` are filtered from that pack, so several
+    configurations on the same repository share a single repomix run.
+    """
+    if not repository.startswith("https://github.com"):
+        content = Path(repository).read_text()
+    elif scan_config is None:
+        content = pack_repo(repository, repomix_config.model_dump_json())
     else:
-        path = Path(repository)
-    with path.open("r") as file:
-        return file.read()
+        files = scan_repo(repository, scan_config.model_dump_json())
+        content = "\n\n".join(
+            section
+            for path, section in files.items()
+            if matches_any(path, repomix_config.include)
+            and not matches_any(path, repomix_config.ignore.customPatterns)
+        )
+    return fit_to_budget(content)
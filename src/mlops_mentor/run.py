@@ -1,39 +1,139 @@
+import asyncio
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from datasets import Dataset
+import orjson
+from datasets import Dataset, Features, Value
 from loguru import logger
 
 from mlops_mentor.common.data import load_groups
-from mlops_mentor.llm_judge import codebase
+from mlops_mentor.common.models import GroupInfo
+from mlops_mentor.llm_judge import codebase_async
 from mlops_mentor.scraper import scrape
+from mlops_mentor.scraper.models import CHECKER_MODULE
+
+# Results are appended per group, so an interrupted run resumes where it stopped
+RESULTS_FILE = Path("outputs/repo_evaluations.jsonl")
+# Maximum number of groups processed at the same time
+GROUP_CONCURRENCY = int(os.getenv("GROUP_CONCURRENCY", "8"))
+# Schema of the results, the stats and evaluation are stored as JSON strings
+RESULTS_FEATURES = Features(
+    {
+        "timestamp": Value("float64"),
+        "group_number": Value("int64"),
+        "repo_url": Value("string"),
+        "stats": Value("string"),
+        "evaluation": Value("string"),
+    }
+)
+
+
+def load_results(results_file: Path = RESULTS_FILE) -> list[dict]:
+    """Loads the results of the groups that have already been processed."""
+    if not results_file.exists():
+        return []
+    with results_file.open("rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+async def process_group(group: GroupInfo) -> dict:
+    """Scrapes and evaluates the repository of a group."""
+    repo_url = group.repo_info.repo_url
+    group_results = {
+        "timestamp": time.time(),
+        "group_number": group.group_number,
+        "repo_url": repo_url,
+    }
+    logger.info(f"Scraping repository: {repo_url}")
+    stats = await asyncio.to_thread(scrape, repo_url)
+    logger.opt(lazy=True).debug(
+        "Repository stats: {}", lambda: stats.model_dump_json(indent=2)
+    )
+    group_results["stats"] = stats.model_dump_json()
+
+    logger.info(f"Evaluating codebase for repository: {repo_url}")
+    evaluation = await codebase_async(repo_url)
+    logger.info(f"Overall codebase score: {evaluation.overall_score}")
+    logger.opt(lazy=True).debug(
+        "Codebase evaluation: {}", lambda: evaluation.model_dump_json(indent=2)
+    )
+    group_results["evaluation"] = evaluation.model_dump_json()
+    return group_results
+
+
+async def process_groups(
+    groups: list[GroupInfo], results: list[dict], results_file: Path = RESULTS_FILE
+) -> None:
+    """Processes the groups concurrently, appending each result as it completes.
+
+    Scraping runs in worker threads while the evaluations share the event loop,
+    and thereby the connections to the model. A failing group is logged and left
+    out, so that it is retried by the next run.
+    """
+    semaphore = asyncio.Semaphore(GROUP_CONCURRENCY)
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with results_file.open("ab") as f:
+
+        async def process(group: GroupInfo) -> None:
+            async with semaphore:
+                group_results = await process_group(group)
+            results.append(group_results)
+            f.write(orjson.dumps(group_results) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        outcomes = await asyncio.gather(
+            *(process(group) for group in groups), return_exceptions=True
+        )
+    for group, outcome in zip(groups, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error(f"Failed to process group {group.group_number}: {outcome}")
+
 
 if __name__ == "__main__":
-    groups = load_groups("group_info.csv")
-    results = []
-    for group in groups:
-        if not group.repo_info.is_accessible:
-            logger.warning(
-                f"Skipping inaccessible repository: {group.repo_info.repo_url}"
-            )
-            continue
-
-        repo_url = group.repo_info.repo_url
-        group_results = {
-            "timestamp": time.time(),
-            "group_number": group.group_number,
-            "repo_url": repo_url,
-        }
-        print(f"Scraping repository: {repo_url}")
-        stats = scrape(repo_url)
-        print(f"Repository stats: {stats}")
-        group_results["stats"] = stats.model_dump_json()
-
-        print(f"Evaluating codebase for repository: {repo_url}")
-        evaluation = codebase(repo_url)
-        print(f"Codebase evaluation: {evaluation}")
-        group_results["evaluation"] = evaluation.model_dump_json()
-
-        results.append(group_results)
-
-    dataset = Dataset.from_list(results)
-    dataset.push_to_hub("rasgaard/repo-evaluations", private=True)
+    import sys
+
+    import typer
+
+    def main(
+        verbose: bool = typer.Option(
+            False, "--verbose", "-v", help="Log full stats and evaluations."
+        ),
+    ) -> None:
+        """Scrape and evaluate the repositories of all groups."""
+        logger.remove()
+        # The report checker logs a warning per failed question, which are
+        # counted rather than shown unless verbose
+        logger.add(
+            sys.stderr,
+            level="DEBUG" if verbose else "INFO",
+            filter=None if verbose else {CHECKER_MODULE: False},
+        )
+
+        groups = load_groups("group_info.csv")
+        results = load_results()
+        processed = {result["group_number"] for result in results}
+        if processed:
+            logger.info(f"Resuming, skipping {len(processed)} processed groups")
+        groups = [group for group in groups if group.group_number not in processed]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            # Resolve accessibility (and redirects) for all groups up front
+            list(executor.map(lambda group: group.repo_info.is_accessible, groups))
+        for group in groups:
+            if not group.repo_info.is_accessible:
+                logger.warning(
+                    f"Skipping inaccessible repository: {group.repo_info.repo_url}"
+                )
+        groups = [group for group in groups if group.repo_info.is_accessible]
+
+        asyncio.run(process_groups(groups, results))
+        results.sort(key=lambda result: result["group_number"])  # Appended as completed
+
+        # Built with a known schema, skipping type inference
+        dataset = Dataset.from_list(results, features=RESULTS_FEATURES)
+        dataset.push_to_hub("rasgaard/repo-evaluations", private=True)
+
+    typer.run(main)
@@ -1,13 +1,115 @@
 import base64
+import importlib.util
 import os
+import re
+import tempfile
+import threading
+from functools import cache, cached_property
 from pathlib import Path
-from subprocess import PIPE, Popen
+from types import FunctionType, ModuleType
 
-import markdown2
+import numpy as np
+import orjson
 import requests
+from loguru import logger
 from pydantic import BaseModel
 
-from mlops_mentor.common import github_headers as headers
+from mlops_mentor.common import get_json, get_session
+
+# Words of a README, counted outside of code blocks and inline code
+_WORD = re.compile(r"\w+")
+_CODE = re.compile(r"```.*?```|`[^`]*`", re.DOTALL)
+
+CHECKER_URL = (
+    "https://api.github.com/repos/SkafteNicki/dtu_mlops/contents/reports/report.py"
+)
+# Module name the checker is imported under, which its log records carry
+CHECKER_MODULE = "dtu_mlops_report"
+
+# Groups scraped concurrently would otherwise all download and import the missing
+# checker, reentrant since load_checker downloads it while holding the lock
+_checker_lock = threading.RLock()
+
+
+@cache
+def download_checker(path: str = "report.py") -> Path | None:
+    """Downloads the report checker script, once per process.
+
+    The script is kept on disk so that later runs skip the download. It is written
+    to a temporary file that is then moved into place, so a partially written
+    script is never run. Returns None if it cannot be downloaded.
+    """
+    checker_path = Path(path).resolve()
+    with _checker_lock:
+        if checker_path.exists():
+            return checker_path
+        try:
+            response = get_session().get(CHECKER_URL)
+        except requests.RequestException as e:
+            logger.error(f"Failed to download the report checker: {e}")
+            return None
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to download the report checker: {response.status_code}"
+            )
+            return None
+        content_base64 = orjson.loads(response.content)["content"]
+        with tempfile.NamedTemporaryFile(
+            dir=checker_path.parent, suffix=".py", delete=False
+        ) as file:
+            file.write(base64.b64decode(content_base64))
+        os.replace(file.name, checker_path)
+    return checker_path
+
+
+def load_checker(path: str = "report.py") -> ModuleType | None:
+    """Downloads and imports the report checker script, once per process.
+
+    Returns None if it cannot be downloaded or imported.
+    """
+    with _checker_lock:
+        return _load_checker(path)
+
+
+@cache
+def _load_checker(path: str) -> ModuleType | None:
+    checker_path = download_checker(path)
+    if checker_path is None:
+        return None
+    spec = importlib.util.spec_from_file_location(CHECKER_MODULE, checker_path)
+    checker = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(checker)
+    except Exception as e:  # noqa: BLE001
+        logger.error(f"Failed to import the report checker: {e}")
+        return None
+    return checker
+
+
+class ActivityMatrix(BaseModel):
+    """Sparse matrix of commit counts per day (rows) and hour (columns)."""
+
+    shape: tuple[int, int]
+    rows: list[int]
+    cols: list[int]
+    vals: list[int]
+
+    @classmethod
+    def from_dense(cls, matrix: np.ndarray) -> "ActivityMatrix":
+        """Creates the sparse matrix from the nonzero entries of a dense matrix."""
+        rows, cols = np.nonzero(matrix)
+        return cls(
+            shape=matrix.shape,
+            rows=rows.tolist(),
+            cols=cols.tolist(),
+            vals=matrix[rows, cols].tolist(),
+        )
+
+    def to_dense(self) -> list[list[int]]:
+        """Returns the dense matrix."""
+        matrix = np.zeros(self.shape, dtype=int)
+        matrix[self.rows, self.cols] = self.vals
+        return matrix.tolist()
 
 
 class RepoStats(BaseModel):
@@ -21,7 +123,7 @@ class RepoStats(BaseModel):
     average_commit_length: float | None
     contributions_per_contributor: list[int] | None
     total_commits: int | None
-    activity_matrix: list[list[int]] | None
+    activity_matrix: ActivityMatrix | None
 
     num_docker_files: int | None
     num_python_files: int | None
@@ -45,56 +147,57 @@ class Report(BaseModel):
 
     repo_api: str
     default_branch: str
-    file_written: bool = False
-
-    def download_checker(self) -> None:
-        """Downloads the checker script from the repository."""
-        if not Path("report.py").exists():
-            url = "https://api.github.com/repos/SkafteNicki/dtu_mlops/contents/reports/report.py"
-            response = requests.get(url, headers=headers, timeout=100)
-            if response.status_code == 200:
-                content_base64 = response.json()["content"]
-                content_decoded = base64.b64decode(content_base64).decode("utf-8")
-                with open("report.py", "w", encoding="utf-8") as file:
-                    file.write(content_decoded)
-
-    def download_report(self) -> None:
-        """Downloads the report from the repository."""
-        if self.file_written:
-            return
-        url = f"{self.repo_api}/contents/reports/README.md"
-        response = requests.get(url, headers=headers, timeout=100).json()
-        if response.get("message") != "Not Found" and response.get("status") != "404":
-            content_base64 = response["content"]
-            content_decoded = base64.b64decode(content_base64).decode("utf-8")
 
-            out_path = Path("./output/README.md")
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(content_decoded, encoding="utf-8")
-            self.file_written = True
-        else:
-            self.file_written = False
+    @cached_property
+    def report(self) -> str | None:
+        """Returns the report of the repository, or None if it has none."""
+        url = f"{self.repo_api}/contents/reports/README.md"
+        response = get_json(url)
+        if response.get("message") == "Not Found" or response.get("status") == "404":
+            return None
+        return base64.b64decode(response["content"]).decode("utf-8")
 
     @property
     def check_answers(self) -> int | None:
-        """Returns the number of warnings in the report."""
-        self.download_checker()
-        self.download_report()
-        if self.file_written:
-            p = Popen(
-                ["python", "report.py", "check"],
-                cwd=".",
-                stdout=PIPE,
-                stderr=PIPE,
-                stdin=PIPE,
-            )
-            if p.stderr is None:
-                return None
-            output = p.stderr.read()
-            output = output.decode("utf-8").split("\n")
-            lines = [line for line in output if "WARNING" in line]
-            return len(lines)
-        return None
+        """Returns the number of warnings in the report.
+
+        The checker's `check` command reads `README.md` from the working directory,
+        which is shared by all threads. It is therefore called with `Path` rebound
+        in a copy of its globals so that it reads the report from a temporary file.
+        Its warnings are logged through loguru and counted by a sink that only
+        accepts records of the checker from the current thread. Returns None if the
+        report or checker is missing or the checker fails.
+        """
+        if self.report is None:
+            return None
+        checker = load_checker()
+        if checker is None:
+            return None
+        warnings = []
+        thread_id = threading.get_ident()
+        handler_id = logger.add(
+            warnings.append,
+            level="WARNING",
+            filter=lambda record: (
+                record["name"] == CHECKER_MODULE and record["thread"].id == thread_id
+            ),
+            format="{message}",
+        )
+        try:
+            with tempfile.TemporaryDirectory(prefix="report_") as workdir:
+                readme_path = Path(workdir, "README.md")
+                readme_path.write_text(self.report, encoding="utf-8")
+                check = FunctionType(
+                    checker.check.__code__,
+                    {**vars(checker), "Path": lambda _: readme_path},
+                )
+                check()
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Report checker failed for {self.repo_api}: {e}")
+            return None
+        finally:
+            logger.remove(handler_id)
+        return len(warnings)
 
 
 class RepoContent(BaseModel):
@@ -103,95 +206,104 @@ class RepoContent(BaseModel):
     repo_api: str
     default_branch: str
 
-    @property
-    def file_tree(self):
+    @cached_property
+    def file_tree(self) -> list[dict]:
         """Returns the file tree of the repository."""
-        if hasattr(self, "_file_tree"):
-            return self._file_tree
         branch_url = f"{self.repo_api}/git/refs/heads/{self.default_branch}"
-        branch_response = requests.get(branch_url, headers=headers, timeout=100).json()
+        branch_response = get_json(branch_url)
         tree_sha = branch_response["object"]["sha"]
         tree_url = f"{self.repo_api}/git/trees/{tree_sha}?recursive=1"
-        tree_response = requests.get(tree_url, headers=headers, timeout=100).json()
-        self._file_tree = tree_response["tree"]
-        return self._file_tree
+        tree_response = get_json(tree_url)
+        return tree_response["tree"]
+
+    @cached_property
+    def _tree_stats(self) -> dict:
+        """Returns the file tree statistics, collected in a single pass."""
+        stats = {
+            "num_docker_files": 0,
+            "num_python_files": 0,
+            "num_workflow_files": 0,
+            "has_requirements_file": False,
+            "has_cloudbuild": False,
+            "using_dvc": False,
+            "total_size_bytes": 0,
+        }
+        for f in self.file_tree:
+            path = f["path"]
+            if "Dockerfile" in path or ".dockerfile" in path:
+                stats["num_docker_files"] += 1
+            if path.endswith(".py"):
+                stats["num_python_files"] += 1
+            if path.startswith(".github/workflows/") and path.endswith(
+                (".yml", ".yaml")
+            ):
+                stats["num_workflow_files"] += 1
+            if path == "requirements.txt" or path.endswith("/requirements.txt"):
+                stats["has_requirements_file"] = True
+            if path == "cloudbuild.yaml" or path.endswith("/cloudbuild.yaml"):
+                stats["has_cloudbuild"] = True
+            if ".dvc" in path:
+                stats["using_dvc"] = True
+            stats["total_size_bytes"] += f.get("size", 0)
+        return stats
 
     @property
     def num_docker_files(self) -> int:
         """Returns the number of Dockerfiles in the repository."""
-        return len(
-            [
-                f
-                for f in self.file_tree
-                if "Dockerfile" in f["path"] or ".dockerfile" in f["path"]
-            ]
-        )
+        return self._tree_stats["num_docker_files"]
 
     @property
     def num_python_files(self) -> int:
         """Returns the number of Python files in the repository."""
-        return len([f for f in self.file_tree if ".py" in f["path"]])
+        return self._tree_stats["num_python_files"]
 
     @property
     def num_workflow_files(self) -> int:
         """Returns the number of workflow files in the repository."""
-        return len(
-            [
-                f
-                for f in self.file_tree
-                if f["path"].startswith(".github/workflows/")
-                and f["path"].endswith((".yml", ".yaml"))
-            ]
-        )
+        return self._tree_stats["num_workflow_files"]
 
     @property
     def has_requirements_file(self) -> bool:
         """Returns True if the repository has a requirements.txt file."""
-        return any("requirements.txt" in f["path"] for f in self.file_tree)
+        return self._tree_stats["has_requirements_file"]
 
     @property
     def has_cloudbuild(self) -> bool:
         """Returns True if the repository uses Google Cloud Build."""
-        return any(
-            os.path.basename(f["path"]) == "cloudbuild.yaml" for f in self.file_tree
-        )
+        return self._tree_stats["has_cloudbuild"]
 
     @property
     def using_dvc(self) -> bool:
         """Returns True if the repository uses DVC."""
-        return any(".dvc" in f["path"] for f in self.file_tree)
+        return self._tree_stats["using_dvc"]
 
     @property
     def repo_size(self) -> float:
         """Returns the size of the repository in MB."""
-        total_size_bytes = sum([f["size"] for f in self.file_tree if "size" in f])
-        return total_size_bytes / (1024**2)
+        return self._tree_stats["total_size_bytes"] / (1024**2)
 
     @property
     def readme_length(self) -> int:
         """Returns the number of words in the README file."""
         readme_url = f"{self.repo_api}/readme"
-        readme_response = requests.get(readme_url, headers=headers, timeout=100).json()
+        readme_response = get_json(readme_url)
         if "content" in readme_response:
             content_base64 = readme_response["content"]
             content_decoded = base64.b64decode(content_base64).decode("utf-8")
-            plain_text = markdown2.markdown(content_decoded, extras=["strip"])
-            return len(plain_text.split())
+            return len(_WORD.findall(_CODE.sub(" ", content_decoded)))
         return 0
 
     @property
     def actions_passing(self) -> bool:
         """Returns True if the GitHub Actions are passing."""
         commit_url = f"{self.repo_api}/commits/{self.default_branch}"
-        commit_response = requests.get(commit_url, headers=headers, timeout=100).json()
+        commit_response = get_json(commit_url)
         latest_commit = commit_response["sha"]
 
         workflow_url = (
             f"{self.repo_api}/actions/runs?branch={self.default_branch}&event=push"
         )
-        workflow_response = requests.get(
-            workflow_url, headers=headers, timeout=100
-        ).json()
+        workflow_response = get_json(workflow_url)
         workflow_runs = workflow_response["workflow_runs"]
 
         all_passing = True
@@ -1,46 +1,50 @@
-import datetime
+import itertools
 import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import requests
 from loguru import logger
 from typer import Typer
 
-from mlops_mentor.common import github_headers as headers
+from mlops_mentor.common.data import load_groups
 from mlops_mentor.common.models import RepoInfo
-from mlops_mentor.scraper.models import RepoContent, Report, RepoStats
+from mlops_mentor.scraper.models import ActivityMatrix, RepoContent, Report, RepoStats
+
+# Concurrent requests per repository, each endpoint paginates concurrently on top
+SCRAPE_WORKERS = 8
 
 
 def create_activity_matrix(
     commits: list,
     max_delta: int = 5,
     min_delta: int = 1,
-) -> list[list[int]]:
+) -> ActivityMatrix:
     """Creates an activity matrix from the commits."""
-    commit_times = [
-        datetime.datetime.fromisoformat(commit["commit"]["committer"]["date"][:-1])
-        for commit in commits
-    ]
+    # Dates are formatted as YYYY-MM-DDTHH:MM:SSZ, the fixed width drops the "Z"
+    commit_times = np.array(
+        [commit["commit"]["committer"]["date"] for commit in commits], dtype="S19"
+    ).astype("datetime64[s]")
     commit_times.sort()
 
     start_time = commit_times[0]
     end_time = max(
-        start_time + datetime.timedelta(weeks=min_delta),
-        min(start_time + datetime.timedelta(weeks=max_delta), commit_times[-1]),
+        start_time + np.timedelta64(min_delta, "W"),
+        min(start_time + np.timedelta64(max_delta, "W"), commit_times[-1]),
     )
 
-    num_days = (end_time - start_time).days + 1  # include last day
-
-    commit_matrix = np.zeros((num_days, 24), dtype=int)
+    num_days = (end_time - start_time) // np.timedelta64(1, "D") + 1  # include last day
 
-    for commit_time in commit_times:
-        if start_time <= commit_time <= end_time:
-            day_index = (commit_time - start_time).days
-            hour_index = commit_time.hour
-            commit_matrix[day_index, hour_index] += 1
+    commit_times = commit_times[commit_times <= end_time]
+    day_indices = (commit_times - start_time) // np.timedelta64(1, "D")
+    hour_indices = (
+        commit_times.astype("datetime64[h]") - commit_times.astype("datetime64[D]")
+    ).astype(int)
+    commit_matrix = np.bincount(
+        day_indices * 24 + hour_indices, minlength=num_days * 24
+    ).reshape(num_days, 24)
 
-    return commit_matrix.tolist()
+    return ActivityMatrix.from_dense(commit_matrix)
 
 
 def scrape(repo_link: str) -> RepoStats:
@@ -71,61 +75,72 @@ def scrape(repo_link: str) -> RepoStats:
         )
     else:
         logger.info(f"Scraping repository {repo.repo_url}")
+        repo_content = RepoContent(
+            repo_api=repo.repo_api,
+            default_branch=repo.default_branch,
+        )
+        report = Report(
+            repo_api=repo.repo_api,
+            default_branch=repo.default_branch,
+        )
+        with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as executor:
+            # The repository content and report do not depend on the commit history,
+            # so they are fetched alongside it
+            content_futures = [
+                executor.submit(getattr, repo_content, name)
+                for name in ("file_tree", "readme_length", "actions_passing")
+            ]
+            num_warnings_future = executor.submit(getattr, report, "check_answers")
+            repo.fetch_all()
+            all_pr_commits = repo.pr_commits(repo.merged_prs)
+            _, readme_length, actions_passing = [f.result() for f in content_futures]
+            num_warnings = num_warnings_future.result()
+
         contributors = repo.contributors
         num_contributors = len(contributors)
 
-        prs = repo.prs
-        num_prs = len(prs)
+        num_prs = repo.num_prs
 
         commits = repo.commits
-        num_commits_to_main = len(commits)
+        num_commits_to_main = repo.num_commits
         commit_messages = [c["commit"]["message"] for c in commits]
         average_commit_length_to_main = sum([len(c) for c in commit_messages]) / len(
             commit_messages
         )
         latest_commit = commits[0]["commit"]["author"]["date"]
 
-        merged_prs = [p["number"] for p in prs if p["merged_at"] is not None]
-        for pr_num in merged_prs:
-            pr_commits: list[dict] = requests.get(
-                f"{repo.repo_api}/pulls/{pr_num}/commits",
-                headers=headers,
-                timeout=100,
-            ).json()
+        by_login = {c.login.lower(): c for c in contributors}
+        for pr_commits in all_pr_commits:
             commit_messages += [c["commit"]["message"] for c in pr_commits]
             for commit in pr_commits:
-                for contributor in contributors:
-                    commit_author = commit.get("author")  # GitHub account info
-                    commit_committer = commit.get("committer")  # GitHub account info
-                    commit_author_name = commit["commit"]["author"]["name"]
-                    commit_committer_name = commit["commit"]["committer"]["name"]
-
-                    matches = (
-                        (
-                            commit_author
-                            and commit_author.get("login") == contributor.login
-                        )
-                        or (
-                            commit_author_name
-                            and commit_author_name.lower() == contributor.login.lower()
-                        )
-                        or (
-                            commit_committer
-                            and commit_committer.get("login") == contributor.login
-                        )
-                        or (
-                            commit_committer_name
-                            and commit_committer_name.lower()
-                            == contributor.login.lower()
-                        )
-                    )
-
-                    if matches:
-                        contributor.commits_pr += 1
-                        break
-            commits += pr_commits
-
-        activity_matrix = create_activity_matrix(commits, max_delta=3, min_delta=1)
+                commit_author = commit.get("author") or {}  # GitHub account info
+                commit_committer = commit.get("committer") or {}  # GitHub account info
+                names = (
+                    commit_author.get("login"),
+                    commit["commit"]["author"]["name"],
+                    commit_committer.get("login"),
+                    commit["commit"]["committer"]["name"],
+                )
+                # The first name naming a contributor, in order of precedence
+                contributor = next(
+                    (
+                        by_login[key]
+                        for key in map(str.lower, filter(None, names))
+                        if key in by_login
+                    ),
+                    None,
+                )
+                if contributor is not None:
+                    contributor.commits_pr += 1
+
+        # Merged commits appear both on the default branch and in their pull request
+        unique_commits = {
+            commit["sha"]: commit
+            for commit in itertools.chain(commits, *all_pr_commits)
+        }
+        activity_matrix = create_activity_matrix(
+            list(unique_commits.values()), max_delta=3, min_delta=1
+        )
 
         average_commit_length = sum([len(c) for c in commit_messages]) / len(
             commit_messages
@@ -134,10 +149,6 @@ def scrape(repo_link: str) -> RepoStats:
         contributions_per_contributor = [c.total_commits for c in contributors]
         total_commits = sum(contributions_per_contributor)
 
-        repo_content = RepoContent(
-            repo_api=repo.repo_api,
-            default_branch=repo.default_branch,
-        )
         num_docker_files = repo_content.num_docker_files
         num_python_files = repo_content.num_python_files
         num_workflow_files = repo_content.num_workflow_files
@@ -145,14 +156,6 @@ def scrape(repo_link: str) -> RepoStats:
         has_cloudbuild = repo_content.has_cloudbuild
         using_dvc = repo_content.using_dvc
         repo_size = repo_content.repo_size
-        readme_length = repo_content.readme_length
-        actions_passing = repo_content.actions_passing
-
-        report = Report(
-            repo_api=repo.repo_api,
-            default_branch=repo.default_branch,
-        )
-        num_warnings = report.check_answers
 
         repo_stats = RepoStats(
             num_contributors=num_contributors,
@@ -183,8 +186,8 @@ def scrape(repo_link: str) -> RepoStats:
 def clone(repo_link: str, base_dir: str = "cloned_repos"):
     """Clones the repositories of the groups."""
 
-    if not os.path.exists(base_dir):
-        os.makedirs(base_dir)
+    # Concurrent clones may create the base directory at the same time
+    os.makedirs(base_dir, exist_ok=True)
 
     repo_url = repo_link
     # Create a directory for the group if it doesn't exist
@@ -202,15 +205,28 @@ def clone(repo_link: str, base_dir: str = "cloned_repos"):
 
     # Clone the repository
     try:
-        subprocess.run(["git", "clone", repo_url, repo_dir], check=True)
+        # Only the current state of the repository is needed, not its history
+        subprocess.run(["git", "clone", "--depth=1", repo_url, repo_dir], check=True)
         logger.info(f"Successfully cloned {repo_url} into {repo_dir}")
     except subprocess.CalledProcessError as e:
         logger.info(f"Failed to clone {repo_url}: {e}")
 
 
+def clone_all(
+    file_name: str = "group_info.csv",
+    base_dir: str = "cloned_repos",
+    max_workers: int = 8,
+):
+    """Clones the repositories of all groups concurrently."""
+    repo_links = [group.repo_info.repo_url for group in load_groups(file_name)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(lambda link: clone(link, base_dir), repo_links))
+
+
 if __name__ == "__main__":
     app = Typer()
     app.command()(scrape)
     app.command()(clone)
+    app.command()(clone_all)
 
     app()